@@ -3,16 +3,22 @@ Production Planning Telegram Bot (Railway-Compatible)
 Trigger production task automation via Telegram commands.
 """
 
+from __future__ import annotations
+
 import asyncio
 import logging
 import os
-from datetime import datetime
+import time
 from pathlib import Path
-from typing import Optional
-import pytz
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page, TimeoutError as PlaywrightTimeout
+from typing import TYPE_CHECKING, Optional
 from telegram import Update
+from telegram.error import RetryAfter
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
+from telegram.request import HTTPXRequest
+
+if TYPE_CHECKING:
+    # Playwright is imported lazily in BrowserSession.start (only /run needs it)
+    from playwright.async_api import BrowserContext, Locator, Page
 
 # ============================================================================
 # CONFIGURATION
@@ -29,7 +35,9 @@ except ValueError:
     ALLOWED_USER_ID = 0
 
 # Authentication & Storage
-AUTH_FILE = "auth.json"
+PROFILE_DIR = ".chrome-profile"  # persistent Chromium profile (cookies, cache, storage)
+SESSION_MARKER = os.path.join(PROFILE_DIR, ".last-login")
+SESSION_MAX_AGE = 12 * 3600  # seconds before a saved session is not worth trying
 
 # Credentials
 AZURE_EMAIL = os.getenv("AZURE_EMAIL", "example@example.com")
@@ -41,7 +49,35 @@ DASHBOARD_URL = f"{BASE_URL}/#/plan-dashboard"
 PRODUCTION_TASKS_URL = f"{BASE_URL}/#/production-tasks"
 
 # Timing
-PAGE_TIMEOUT = 30000  # 30 seconds
+NAVIGATION_TIMEOUT = 30000  # ms, default for goto/wait_for_url
+ACTION_TIMEOUT = 8000  # ms, default for selector waits and clicks/fills
+GOTO_RETRIES = 3  # navigation attempts before giving up
+SESSION_PROBE_TIMEOUT = 10000  # ms, single navigation when checking a saved session
+SESSION_PROBE_CARD_TIMEOUT = 4000  # ms, wait for dashboard cards when checking a saved session
+TWO_FA_TIMEOUT = 120  # seconds to wait for the user's 2FA reply
+TELEGRAM_SEND_INTERVAL = 1.05  # seconds between messages (~1 msg/s per chat limit)
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+# Extra Chromium flags on top of Playwright's defaults (which already include --no-sandbox,
+# --disable-dev-shm-usage, --disable-extensions, --disable-background-networking, ...)
+CHROMIUM_ARGS = [
+    '--disable-setuid-sandbox',
+    '--disable-gpu',
+    '--disable-sync',
+    # Must repeat Playwright's headless pointer/hover settings: the last --blink-settings wins
+    '--blink-settings=primaryHoverType=2,availableHoverTypes=2,primaryPointerType=4,availablePointerTypes=4,imagesEnabled=false',
+]
+
+# URL patterns Chromium refuses to fetch (Network.setBlockedURLs); images are off via CHROMIUM_ARGS.
+# Blocked in-browser rather than with context.route, which would disable the HTTP cache.
+BLOCKED_URL_PATTERNS = [
+    # Web fonts (trailing * also catches ?v= cache-busters)
+    "*.woff*", "*.ttf*", "*.otf*", "*.eot*",
+    # Audio/video
+    "*.mp4*", "*.webm*", "*.mp3*", "*.ogg*", "*.wav*",
+    # Analytics/tracking hosts
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*segment.io*", "*hotjar.com*",
+]
 
 # Selectors
 SELECTORS = {
@@ -62,6 +98,30 @@ SELECTORS = {
     'verification_code_input': 'input[name="otc"], input[type="tel"]',
 }
 
+# Either screen that can follow the password step (first match wins)
+POST_PASSWORD_SELECTOR = f"{SELECTORS['verification_code_input']}, {SELECTORS['dashboard_cards']}"
+
+# Extracts {name, completion, items_left} for every dashboard card in-page
+DASHBOARD_SCRAPE_JS = """
+(sel) => Array.from(document.querySelectorAll(sel.dashboard_cards)).map(card => {
+    const text = (s) => (card.querySelector(s)?.innerText || '').trim();
+    return {
+        name: text(sel.card_title) || 'Unknown',
+        completion: parseInt(text(sel.completion_percentage), 10) || 0,
+        items_left: parseInt(text(sel.items_left).replace(/[()]/g, ''), 10) || 0,
+    };
+})
+"""
+
+def visible(selector: str) -> str:
+    """Restrict every part of a selector list to visible elements.
+
+    Form Locators use visible(...) + .first, matching the first visible element
+    like wait_for_selector did; a plain strict Locator would fail if Azure
+    renders an extra hidden match.
+    """
+    return ", ".join(f"{part.strip()}:visible" for part in selector.split(","))
+
 # ============================================================================
 # LOGGING
 # ============================================================================
@@ -76,161 +136,315 @@ def setup_logging():
 
 logger = logging.getLogger(__name__)
 
+# ============================================================================
+# BROWSER SESSION
+# ============================================================================
+
+class BrowserSession:
+    """Chromium on the persistent profile, kept alive across /run invocations"""
+
+    def __init__(self):
+        self.playwright = None
+        self.context: Optional[BrowserContext] = None
+        self.page: Optional[Page] = None
+        self.timeout_error: Optional[type[Exception]] = None  # Playwright TimeoutError, set in start
+        self.error: Optional[type[Exception]] = None  # Playwright's base Error, set in start
+
+    def is_alive(self) -> bool:
+        return self.page is not None and not self.page.is_closed()
+
+    def _on_gone(self, *_):
+        """Renderer crashed or context closed: drop the page so the next run relaunches"""
+        if self.page is not None:
+            logger.warning("Browser page crashed or closed; it will be relaunched on the next run")
+        self.page = None
+
+    async def start(self):
+        """Launch Chromium, replacing a browser that has gone away"""
+        await self.close()
+        from playwright.async_api import async_playwright, Error as PlaywrightError, TimeoutError as PlaywrightTimeout
+        self.timeout_error = PlaywrightTimeout
+        self.error = PlaywrightError
+        try:
+            self.playwright = await async_playwright().start()
+
+            # Launch headless browser on the persistent profile (keeps cookies and caches between runs)
+            self.context = await self.playwright.chromium.launch_persistent_context(
+                PROFILE_DIR,
+                headless=True,
+                args=CHROMIUM_ARGS,
+                service_workers="block",
+                viewport={"width": 1280, "height": 720},
+            )
+            self.context.set_default_navigation_timeout(NAVIGATION_TIMEOUT)
+            self.context.set_default_timeout(ACTION_TIMEOUT)
+            page = self.context.pages[0] if self.context.pages else await self.context.new_page()
+            cdp = await self.context.new_cdp_session(page)
+            await cdp.send("Network.enable")
+            await cdp.send("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+            page.on("dialog", self._on_dialog)
+            page.on("popup", self._on_popup)
+            page.on("crash", self._on_gone)
+            self.context.on("close", self._on_gone)
+        except Exception:
+            # Don't leave a half-configured browser behind for the next run to reuse
+            await self.close()
+            raise
+
+        # Only a fully set-up page counts as alive
+        self.page = page
+
+    @staticmethod
+    async def _on_dialog(dialog):
+        """Dismiss alerts/confirms so they never block the automation"""
+        logger.warning(f"Dismissing {dialog.type} dialog: {dialog.message}")
+        await dialog.dismiss()
+
+    @staticmethod
+    async def _on_popup(popup):
+        """Close popups opened by the app; the bot only drives the main page"""
+        logger.warning(f"Closing popup: {popup.url}")
+        await popup.close()
+
+    async def close(self):
+        """Shut the browser down"""
+        self.page = None  # deliberate shutdown, so the close event isn't reported as a crash
+        try:
+            if self.context: await self.context.close()
+            if self.playwright: await self.playwright.stop()
+        except Exception as e:
+            logger.error(f"Browser shutdown error: {e}")
+        self.playwright = self.context = None
+
+browser_session = BrowserSession()
+
 # ============================================================================
 # PRODUCTION MONITOR
 # ============================================================================
 
 class ProductionMonitor:
     def __init__(self, telegram_chat_id: Optional[int] = None, telegram_app=None):
-        self.browser: Optional[Browser] = None
-        self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
-        self.playwright = None
+        self._timeout_error: Optional[type[Exception]] = None  # Playwright TimeoutError, set in initialize
+        self._playwright_error: Optional[type[Exception]] = None  # Playwright's base Error, set in initialize
+        self.loc_submit: Optional[Locator] = None
+        self.loc_cards: Optional[Locator] = None
         self.telegram_chat_id = telegram_chat_id
         self.telegram_app = telegram_app
         self.waiting_for_2fa = False
         self.two_fa_code = None
-
-    async def send_telegram(self, message: str):
-        """Send message to Telegram"""
+        self.two_fa_event = asyncio.Event()
+        self._send_queue: asyncio.Queue = asyncio.Queue()
+        self._sender_task: Optional[asyncio.Task] = None
+        self._status_lines: list[str] = []
+        self.status_msg_id: Optional[int] = None
+
+    def send_telegram(self, message: str, notify: bool = False):
+        """Queue message for Telegram without waiting for delivery.
+
+        Progress lines are collected into a single status message that is
+        edited in place; notify=True sends a separate message instead, so the
+        user gets a notification for prompts and results.
+        """
         if self.telegram_app and self.telegram_chat_id:
+            if not self._sender_task:
+                self._sender_task = asyncio.create_task(self._telegram_sender())
+            self._send_queue.put_nowait((message, notify))
+        logger.info(message)
+
+    async def _telegram_sender(self):
+        """Deliver queued messages in order, paced to the per-chat rate limit"""
+        while True:
+            # Everything queued since the last delivery goes out as one update
+            batch = [await self._send_queue.get()]
+            while not self._send_queue.empty():
+                batch.append(self._send_queue.get_nowait())
             try:
-                await self.telegram_app.bot.send_message(chat_id=self.telegram_chat_id, text=message)
+                status_changed = False
+                for message, notify in batch:
+                    if not notify:
+                        self._status_lines.append(message)
+                        status_changed = True
+                        continue
+                    if status_changed:
+                        await self._update_status()
+                        status_changed = False
+                    await self._call_telegram(
+                        self.telegram_app.bot.send_message, chat_id=self.telegram_chat_id, text=message
+                    )
+                if status_changed:
+                    await self._update_status()
+            finally:
+                for _ in batch:
+                    self._send_queue.task_done()
+
+    async def _update_status(self):
+        """Post the status message, or edit it in place once it exists"""
+        text = "\n".join(self._status_lines)
+        if len(text) > TELEGRAM_MAX_MESSAGE_LENGTH:
+            # Start a new status message rather than exceed Telegram's size limit
+            self._status_lines = self._status_lines[-1:]
+            self.status_msg_id = None
+            text = self._status_lines[0][:TELEGRAM_MAX_MESSAGE_LENGTH]
+
+        if self.status_msg_id is None:
+            msg = await self._call_telegram(
+                self.telegram_app.bot.send_message, chat_id=self.telegram_chat_id, text=text
+            )
+            if msg:
+                self.status_msg_id = msg.message_id
+        else:
+            await self._call_telegram(
+                self.telegram_app.bot.edit_message_text,
+                chat_id=self.telegram_chat_id, message_id=self.status_msg_id, text=text
+            )
+
+    async def _call_telegram(self, method, **kwargs):
+        """Call a bot API method, honouring flood-control backoff and pacing every call"""
+        for _ in range(3):
+            try:
+                result = await method(**kwargs)
+            except RetryAfter as e:
+                logger.warning(f"Telegram rate limit hit, retrying in {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+                continue
             except Exception as e:
                 logger.error(f"Error sending Telegram message: {e}")
-        logger.info(message)
+                result = None
+            # At most one API call per interval, however many calls a batch needs
+            await asyncio.sleep(TELEGRAM_SEND_INTERVAL)
+            return result
+        return None
+
+    async def flush_telegram(self):
+        """Wait for queued messages to be delivered and stop the sender"""
+        if self._sender_task:
+            await self._send_queue.join()
+            self._sender_task.cancel()
+            self._sender_task = None
 
     async def initialize(self):
-        """Initialize Playwright browser"""
-        await self.send_telegram("🚀 Initializing browser...")
-        self.playwright = await async_playwright().start()
-
-        # Try to launch headless browser
-        try:
-            self.browser = await self.playwright.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-setuid-sandbox']
-            )
-        except Exception as e:
-            await self.send_telegram(f"❌ Browser launch failed: {e}")
-            raise
+        """Attach to the shared browser, launching it on first use"""
+        if not browser_session.is_alive():
+            self.send_telegram("🚀 Initializing browser...")
+            try:
+                await browser_session.start()
+            except Exception as e:
+                self.send_telegram(f"❌ Browser launch failed: {e}")
+                raise
 
-        # Load or create new context
-        auth_file = Path(AUTH_FILE)
-        if auth_file.exists():
-            self.context = await self.browser.new_context(storage_state=AUTH_FILE)
-        else:
-            self.context = await self.browser.new_context()
+        self.page = browser_session.page
+        self._timeout_error = browser_session.timeout_error
+        self._playwright_error = browser_session.error
 
-        self.context.set_default_timeout(PAGE_TIMEOUT)
-        self.page = await self.context.new_page()
+        # Locators are lazy, so build them once and reuse them for the whole run
+        self.loc_submit = self.page.locator(visible(SELECTORS['submit_button'])).first
+        self.loc_cards = self.page.locator(SELECTORS['dashboard_cards'])
 
-    async def save_session(self):
-        """Save session"""
-        if self.context:
-            await self.context.storage_state(path=AUTH_FILE)
-            logger.info(f"Session saved to {AUTH_FILE}")
+    async def _goto(self, url: str, **kwargs):
+        """Navigate, retrying timeouts with exponential backoff"""
+        for attempt in range(GOTO_RETRIES):
+            try:
+                return await self.page.goto(url, **kwargs)
+            except self._timeout_error:
+                if attempt == GOTO_RETRIES - 1:
+                    raise
+                logger.warning(f"Navigation to {url} timed out, retrying ({attempt + 1}/{GOTO_RETRIES - 1})")
+                await asyncio.sleep(1 << attempt)
+
+    def save_session(self):
+        """Record a working session (cookies themselves live in the profile)"""
+        Path(SESSION_MARKER).touch()
+        logger.info(f"Session recorded in {PROFILE_DIR}")
+
+    async def has_valid_session(self) -> bool:
+        """Check whether a recent saved session still reaches the dashboard"""
+        marker = Path(SESSION_MARKER)
+        if not marker.exists() or time.time() - marker.stat().st_mtime > SESSION_MAX_AGE:
+            return False
+        try:
+            # A single short attempt: if the probe is slow, logging in is the cheaper path
+            await self.page.goto(DASHBOARD_URL, wait_until='domcontentloaded', timeout=SESSION_PROBE_TIMEOUT)
+            await self.loc_cards.first.wait_for(timeout=SESSION_PROBE_CARD_TIMEOUT)
+        except self._playwright_error as e:
+            # Timeouts, net::ERR_*, navigations interrupted by a login redirect... all mean "log in"
+            logger.info(f"Saved session not usable: {e}")
+            return False
+        self.send_telegram("🔓 Reusing saved session.")
+        self.save_session()
+        return True
 
     async def handle_login(self):
         """Azure login with 2FA"""
-        await self.send_telegram("🔐 Logging in...")
+        self.send_telegram("🔐 Logging in...")
         try:
-            await self.page.goto(BASE_URL, wait_until='networkidle')
+            await self._goto(BASE_URL, wait_until='domcontentloaded')
 
             # Select company
             try:
-                btn = await self.page.wait_for_selector(SELECTORS['food_lion_button'], timeout=5000)
-                await btn.click()
-                await asyncio.sleep(2)
-            except PlaywrightTimeout:
+                await self.page.locator(visible(SELECTORS['food_lion_button'])).first.click(timeout=5000)
+            except self._timeout_error:
                 pass
 
             # Email
-            email_input = await self.page.wait_for_selector(SELECTORS['email_input'], timeout=10000)
-            await email_input.fill(AZURE_EMAIL)
+            await self.page.locator(visible(SELECTORS['email_input'])).first.fill(AZURE_EMAIL, timeout=10000)
 
-            submit = await self.page.query_selector(SELECTORS['submit_button'])
-            if submit:
-                await submit.click()
-                await asyncio.sleep(2)
+            await self.loc_submit.click(timeout=10000)
 
             # Password
-            password_input = await self.page.wait_for_selector(SELECTORS['password_input'], timeout=10000)
-            await password_input.fill(AZURE_PASSWORD)
+            await self.page.locator(visible(SELECTORS['password_input'])).first.fill(AZURE_PASSWORD, timeout=10000)
 
-            submit = await self.page.query_selector(SELECTORS['submit_button'])
-            if submit:
-                await submit.click()
-                await asyncio.sleep(3)
+            await self.loc_submit.click(timeout=10000)
 
-            # Check 2FA
+            # Either the 2FA prompt or the dashboard comes next
             try:
-                code_input = await self.page.wait_for_selector(SELECTORS['verification_code_input'], timeout=5000)
-                await self.send_telegram("📱 2FA required. Send me your code.")
-                self.waiting_for_2fa = True
+                next_step = await self.page.wait_for_selector(POST_PASSWORD_SELECTOR, timeout=10000)
+                needs_2fa = await next_step.evaluate(
+                    "(el, sel) => el.matches(sel)", SELECTORS['verification_code_input']
+                )
+            except self._timeout_error:
+                needs_2fa = False
 
-                for _ in range(60):
-                    if self.two_fa_code:
-                        break
-                    await asyncio.sleep(2)
+            # Check 2FA
+            if needs_2fa:
+                self.send_telegram("📱 2FA required. Send me your code.", notify=True)
+                self.waiting_for_2fa = True
 
-                if not self.two_fa_code:
-                    await self.send_telegram("❌ 2FA timeout.")
+                try:
+                    await asyncio.wait_for(self.two_fa_event.wait(), timeout=TWO_FA_TIMEOUT)
+                except asyncio.TimeoutError:
+                    self.send_telegram("❌ 2FA timeout.")
                     return False
 
-                await code_input.fill(self.two_fa_code)
-                submit = await self.page.query_selector(SELECTORS['submit_button'])
-                if submit:
-                    await submit.click()
+                # Re-resolve the input: the page may have re-rendered while we waited for the user
+                await self.page.locator(visible(SELECTORS['verification_code_input'])).first.fill(self.two_fa_code, timeout=10000)
+                await self.loc_submit.click(timeout=10000)
 
                 self.waiting_for_2fa = False
                 self.two_fa_code = None
-            except PlaywrightTimeout:
-                pass
+                self.two_fa_event.clear()
 
-            await self.page.wait_for_url('**/plan-dashboard', timeout=30000)
-            await self.send_telegram("✅ Login successful!")
-            await self.save_session()
+            await self.page.wait_for_url('**/plan-dashboard', wait_until='domcontentloaded', timeout=30000)
+            self.send_telegram("✅ Login successful!")
+            self.save_session()
             return True
 
         except Exception as e:
-            await self.send_telegram(f"❌ Login error: {e}")
+            self.send_telegram(f"❌ Login error: {e}")
             logger.error("Login error", exc_info=True)
             return False
 
     async def check_dashboard(self):
         """Scrape dashboard"""
-        await self.send_telegram("📊 Checking dashboard...")
+        self.send_telegram("📊 Checking dashboard...")
         try:
-            await self.page.goto(DASHBOARD_URL, wait_until='networkidle')
-            await self.page.wait_for_selector(SELECTORS['dashboard_cards'], timeout=10000)
-
-            cards = await self.page.query_selector_all(SELECTORS['dashboard_cards'])
-            categories = []
-
-            for card in cards:
-                try:
-                    title_elem = await card.query_selector(SELECTORS['card_title'])
-                    category = await title_elem.inner_text() if title_elem else "Unknown"
-
-                    percent_elem = await card.query_selector(SELECTORS['completion_percentage'])
-                    completion = int((await percent_elem.inner_text()).strip()) if percent_elem else 0
-
-                    items_elem = await card.query_selector(SELECTORS['items_left'])
-                    items_text = (await items_elem.inner_text()) if items_elem else "(0"
-                    items_left = int(items_text.strip('()')) if items_text else 0
-
-                    categories.append({
-                        "name": category.strip(),
-                        "completion": completion,
-                        "items_left": items_left
-                    })
-                except Exception as e:
-                    logger.warning(f"Card parse error: {e}")
+            await self._goto(DASHBOARD_URL, wait_until='domcontentloaded')
+            await self.loc_cards.first.wait_for(timeout=10000)
 
-            return categories
+            # Read every card in one round-trip instead of several per card
+            return await self.page.evaluate(DASHBOARD_SCRAPE_JS, SELECTORS)
         except Exception as e:
-            await self.send_telegram(f"❌ Dashboard error: {e}")
+            self.send_telegram(f"❌ Dashboard error: {e}")
             return []
 
     async def run_full_check(self):
@@ -238,45 +452,48 @@ class ProductionMonitor:
         try:
             await self.initialize()
 
-            if not await self.handle_login():
-                await self.send_telegram("❌ Login failed.")
+            if not await self.has_valid_session() and not await self.handle_login():
+                self.send_telegram("❌ Login failed.", notify=True)
                 await self.cleanup()
                 return
 
             categories = await self.check_dashboard()
             if not categories:
-                await self.send_telegram("❌ No dashboard data found.")
+                self.send_telegram("❌ No dashboard data found.", notify=True)
                 await self.cleanup()
                 return
 
-            summary = "📋 Dashboard Summary:\n"
-            for cat in categories:
-                summary += f" • {cat['name']}: {cat['completion']}% ({cat['items_left']} left)\n"
-            await self.send_telegram(summary)
+            lines = ["📋 Dashboard Summary:"]
+            lines.extend(f" • {cat['name']}: {cat['completion']}% ({cat['items_left']} left)" for cat in categories)
+            self.send_telegram("\n".join(lines), notify=True)
 
-            await self.send_telegram("🎯 Processing incomplete categories...")
+            self.send_telegram("🎯 Processing incomplete categories...")
             await self.cleanup()
         except Exception as e:
-            await self.send_telegram(f"❌ Main process error: {e}")
+            self.send_telegram(f"❌ Main process error: {e}", notify=True)
             await self.cleanup()
 
     async def cleanup(self):
-        """Close resources"""
+        """Park the shared page until the next run (the browser itself stays up)"""
         try:
-            await self.save_session()
-            if self.page: await self.page.close()
-            if self.context: await self.context.close()
-            if self.browser: await self.browser.close()
-            if self.playwright: await self.playwright.stop()
-            logger.info("Cleaned up Playwright session.")
+            if self.page and not self.page.is_closed():
+                # Leave the SPA so its polling doesn't keep running between runs
+                await self.page.goto("about:blank")
+            logger.info("Parked Playwright page.")
         except Exception as e:
             logger.error(f"Cleanup error: {e}")
+        await self.flush_telegram()
 
 # ============================================================================
 # TELEGRAM HANDLERS
 # ============================================================================
 
 active_monitor: Optional[ProductionMonitor] = None
+RUN_LOCK = asyncio.Lock()  # one browser run at a time (they share the Chromium profile)
+
+async def shutdown_browser(application: Application):
+    """Close the shared browser when the bot stops"""
+    await browser_session.close()
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user.id != ALLOWED_USER_ID:
@@ -290,21 +507,28 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "If 2FA required, send your code directly."
     )
 
+async def run_monitor(monitor: ProductionMonitor):
+    """Run a full check, keeping active_monitor set until it finishes"""
+    global active_monitor
+    async with RUN_LOCK:
+        try:
+            await monitor.run_full_check()
+        finally:
+            active_monitor = None
+
 async def run_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     global active_monitor
     if update.effective_user.id != ALLOWED_USER_ID:
         await update.message.reply_text("⛔ Unauthorized")
         return
 
-    if active_monitor:
+    if active_monitor or RUN_LOCK.locked():
         await update.message.reply_text("⚠️ Already running!")
         return
 
-    await update.message.reply_text("🚀 Starting automation...")
     active_monitor = ProductionMonitor(update.effective_chat.id, context.application)
-    asyncio.create_task(active_monitor.run_full_check())
-    await asyncio.sleep(2)
-    active_monitor = None
+    await update.message.reply_text("🚀 Starting automation...")
+    context.application.create_task(run_monitor(active_monitor), update=update)
 
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.effective_user.id != ALLOWED_USER_ID:
@@ -322,6 +546,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         code = update.message.text.strip()
         if code.isdigit() and 4 <= len(code) <= 8:
             active_monitor.two_fa_code = code
+            active_monitor.two_fa_event.set()
             await update.message.reply_text("✅ Code received.")
         else:
             await update.message.reply_text("⚠️ Invalid code format.")
@@ -338,7 +563,22 @@ def main():
         logger.error("❌ TELEGRAM_BOT_TOKEN missing. Set it in Railway variables.")
         return
 
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    # uvloop's event loop has cheaper task switches; fall back to asyncio's if unavailable
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        logger.info("uvloop not installed, using the default asyncio event loop")
+
+    # Keep a warm connection pool for bot API calls; getUpdates long-polls on its own
+    application = (
+        Application.builder()
+        .token(TELEGRAM_BOT_TOKEN)
+        .request(HTTPXRequest(connection_pool_size=16, connect_timeout=5, read_timeout=10))
+        .get_updates_request(HTTPXRequest(connect_timeout=5))
+        .post_shutdown(shutdown_browser)
+        .build()
+    )
 
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("run", run_command))